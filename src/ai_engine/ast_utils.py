@@ -0,0 +1,31 @@
+import ast
+from typing import Iterator
+
+# Node classes are never subclassed, so type(node) in _IMPORT_TYPES is exact and
+# cheaper than isinstance() against a tuple on every node.
+_IMPORT_TYPES = frozenset({ast.Import, ast.ImportFrom})
+
+
+def iter_nodes(root: ast.AST) -> Iterator[ast.AST]:
+    """Yields every node under root, root included, in depth-first source order.
+
+    Visits the same nodes as ast.walk, but reads each node's _fields directly
+    and keeps a single list as the stack instead of chaining the
+    iter_child_nodes/iter_fields generators for every node.
+    """
+    AST = ast.AST
+    stack = [root]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        node = pop()
+        yield node
+        # Push children in reverse so they are popped in source order
+        for name in reversed(node._fields):
+            value = getattr(node, name, None)
+            if type(value) is list:
+                for item in reversed(value):
+                    if isinstance(item, AST):
+                        push(item)
+            elif isinstance(value, AST):
+                push(value)
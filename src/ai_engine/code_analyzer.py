@@ -2,33 +2,109 @@ import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="torch._utils")
 
 from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 import ast
+import io
 import os
+import tokenize
 import logging
-import networkx as nx
-from transformers import AutoTokenizer, AutoModel
-import torch
+from functools import cached_property
 from .dependency_analyzer import DependencyAnalyzer
 from .pattern_recognizer import PatternRecognizer
 from .exceptions import CodeParsingError, ModelLoadError, DependencyAnalysisError, PatternAnalysisError
 from .logging_config import get_logger
+from .ast_utils import iter_nodes
 
 logger = get_logger(__name__)  # Fix: Add __name__ as parameter
 
+# File reads dominate parsing on large trees, so use more threads than cores.
+_PARSE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+
+_SOURCE_EXTENSIONS = frozenset({'.py', '.js', '.java', '.cpp', '.h'})
+
+# VCS metadata, caches and vendored environments never hold project sources.
+_SKIP_DIRS = frozenset({'.git', '__pycache__', 'node_modules', '.venv'})
+
+
+def _read_and_parse(file_path: str) -> Dict:
+    """Reads a source file and parses it into an AST."""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    # Parsing bytes skips the str -> UTF-8 round trip inside the parser and
+    # honours PEP 263 coding cookies and BOMs.
+    tree = ast.parse(raw, filename=file_path)
+    encoding, _ = tokenize.detect_encoding(io.BytesIO(raw).readline)
+    # Decoded as text-mode open() would, turning \r\n and \r into \n
+    content = io.TextIOWrapper(io.BytesIO(raw), encoding).read()
+    return {
+        'ast': tree,
+        'content': content
+    }
+
+
+def _extract_imports(tree: ast.AST) -> List[Dict]:
+    """Lists the imported modules and names in an AST."""
+    imports = []
+    for node in iter_nodes(tree):
+        node_type = type(node)
+        if node_type is ast.Import:
+            for name in node.names:
+                imports.append({'module': name.name, 'type': 'import'})
+        elif node_type is ast.ImportFrom:
+            for name in node.names:
+                imports.append({
+                    'module': node.module,
+                    'name': name.name,
+                    'type': 'importfrom'
+                })
+    return imports
+
+
 class CodeAnalyzer:
-    def __init__(self, model_name: str = "microsoft/codebert-base"):
+    def __init__(
+        self,
+        model_name: str = "microsoft/codebert-base",
+        half_precision: bool = False,
+        compile_model: bool = False,
+        quantize: bool = False,
+        device: Optional[str] = None
+    ):
         self.logger = get_logger(__name__)  # Fix: Add __name__ as parameter
+        try:
+            # Imported here: transformers (and torch behind it) take seconds to load
+            import torch  # noqa: F401
+            import sklearn  # noqa: F401
+            from transformers import AutoTokenizer, AutoModel
+        except ImportError:
+            raise ModelLoadError(
+                "CodeAnalyzer requires torch, transformers and scikit-learn; "
+                "install them with: pip install github-review-agent[ai]"
+            )
         try:
             self.logger.info(f"Initializing CodeAnalyzer with model: {model_name}")
             self.tokenizer = AutoTokenizer.from_pretrained(model_name)
             self.model = AutoModel.from_pretrained(model_name)
-            self.knowledge_graph = nx.DiGraph()
             self.dependency_analyzer = DependencyAnalyzer()
-            self.pattern_recognizer = PatternRecognizer(self.model)
+            self.pattern_recognizer = PatternRecognizer(
+                self.model,
+                half_precision=half_precision,
+                compile_model=compile_model,
+                quantize=quantize,
+                device=device,
+                model_name=model_name
+            )
+            self._parse_cache = {}
+            self._imports_cache = {}
         except Exception as e:
             self.logger.error(f"Failed to initialize CodeAnalyzer: {str(e)}")
             raise ModelLoadError(f"Failed to load model {model_name}: {str(e)}")
         
+    @cached_property
+    def knowledge_graph(self):
+        """Graph of code relationships, created on first access."""
+        import networkx as nx
+        return nx.DiGraph()
+
     def scan_repository(self, repo_path: str) -> Dict:
         """Scans repository and builds knowledge base."""
         try:
@@ -60,52 +136,85 @@ class CodeAnalyzer:
         """Recursively collects all relevant source files."""
         try:
             source_files = []
-            for root, _, files in os.walk(path):
-                for file in files:
-                    if file.endswith(('.py', '.js', '.java', '.cpp', '.h')):
-                        source_files.append(os.path.join(root, file))
+            stack = [path]
+            while stack:
+                try:
+                    entries = os.scandir(stack.pop())
+                except OSError:
+                    continue  # Unreadable directories are skipped, as os.walk does
+                with entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in _SKIP_DIRS:
+                                stack.append(entry.path)
+                        elif (os.path.splitext(entry.name)[1] in _SOURCE_EXTENSIONS
+                              and entry.is_file()):
+                            source_files.append(entry.path)
             return source_files
         except Exception as e:
             self.logger.error(f"File collection failed: {str(e)}")
             raise CodeParsingError(f"Failed to collect files: {str(e)}")
 
     def _parse_files(self) -> Dict:
-        """Parses source files into AST trees."""
-        ast_trees = {}
-        for file_path in self.files:
+        """Parses source files into AST trees.
+
+        Parsed entries are kept per path and reused on the next scan while the
+        file's mtime and size are unchanged, so a rescan only re-reads and
+        re-parses modified files. Files that do need parsing are read on a
+        thread pool so their I/O overlaps.
+        """
+        parse_cache = {}
+        pending = {}
+        with ThreadPoolExecutor(max_workers=_PARSE_WORKERS) as executor:
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                ast_trees[file_path] = {
-                    'ast': ast.parse(content),
-                    'content': content
-                }
-            except SyntaxError as e:
-                self.logger.error(f"Failed to parse {file_path}: {str(e)}")
-                raise CodeParsingError(f"Invalid syntax in {file_path}: {str(e)}")
-            except Exception as e:
-                self.logger.error(f"Failed to parse {file_path}: {str(e)}")
-                raise CodeParsingError(f"Failed to parse {file_path}: {str(e)}")
-        return ast_trees
+                for file_path in self.files:
+                    try:
+                        stat = os.stat(file_path)
+                    except Exception as e:
+                        self.logger.error(f"Failed to parse {file_path}: {str(e)}")
+                        raise CodeParsingError(f"Failed to parse {file_path}: {str(e)}")
+                    key = (stat.st_mtime_ns, stat.st_size)
+                    cached = self._parse_cache.get(file_path)
+                    if cached is not None and cached[0] == key:
+                        parse_cache[file_path] = cached
+                    else:
+                        pending[file_path] = (key, executor.submit(_read_and_parse, file_path))
+
+                for file_path, (key, future) in pending.items():
+                    try:
+                        parse_cache[file_path] = (key, future.result())
+                    except SyntaxError as e:
+                        self.logger.error(f"Failed to parse {file_path}: {str(e)}")
+                        raise CodeParsingError(f"Invalid syntax in {file_path}: {str(e)}")
+                    except Exception as e:
+                        self.logger.error(f"Failed to parse {file_path}: {str(e)}")
+                        raise CodeParsingError(f"Failed to parse {file_path}: {str(e)}")
+            except BaseException:
+                # Stop at the first bad file rather than letting the executor
+                # read and parse everything still queued before raising
+                for _, future in pending.values():
+                    future.cancel()
+                raise
+        self._parse_cache = parse_cache
+        return {file_path: parse_cache[file_path][1] for file_path in self.files}
 
     def _analyze_dependencies(self) -> Dict:
         """Analyzes dependencies between files."""
         try:
             dependencies = {}
+            imports_cache = {}
             for file_path, tree_info in self.ast_trees.items():
-                imports = []
-                for node in ast.walk(tree_info['ast']):
-                    if isinstance(node, ast.Import):
-                        for name in node.names:
-                            imports.append({'module': name.name, 'type': 'import'})
-                    elif isinstance(node, ast.ImportFrom):
-                        for name in node.names:
-                            imports.append({
-                                'module': node.module,
-                                'name': name.name,
-                                'type': 'importfrom'
-                            })
+                tree = tree_info['ast']
+                # Unchanged files come back from the parse cache as the same
+                # tree object, so their imports can be reused as-is.
+                cached = self._imports_cache.get(file_path)
+                if cached is not None and cached[0] is tree:
+                    imports = cached[1]
+                else:
+                    imports = _extract_imports(tree)
+                imports_cache[file_path] = (tree, imports)
                 dependencies[file_path] = {'imports': imports}
+            self._imports_cache = imports_cache
             return dependencies
         except Exception as e:
             self.logger.error(f"Dependency analysis failed: {str(e)}")
@@ -130,31 +239,3 @@ class CodeAnalyzer:
     def identify_patterns(self, code_snippet: str) -> List[Dict]:
         """Identifies common patterns in code."""
         pass
-
-    def test_build_knowledge_representation(self):
-        # Setup test data
-        self.analyzer.files = [
-            os.path.join(self.test_dir, 'main.py'),
-            os.path.join(self.test_dir, 'utils.py')
-        ]
-        self.analyzer.ast_trees = {
-            'main.py': {
-                'ast': ast.parse('def main(): pass'),
-                'content': 'def main(): pass'
-            },
-            'utils.py': {
-                'ast': ast.parse('import os'),
-                'content': 'import os'
-            }
-        }
-        self.analyzer.dependencies = {
-            'main.py': {'imports': []},
-            'utils.py': {'imports': [{'module': 'os'}]}
-        }
-        
-        knowledge = self.analyzer._build_knowledge_representation()
-        
-        self.assertIn('files', knowledge)
-        self.assertIn('dependencies', knowledge)
-        self.assertIn('patterns', knowledge)
-        self.assertIn('graph', knowledge)
@@ -1,21 +1,26 @@
 from typing import Dict, List
-import networkx as nx
 import ast
 from pathlib import Path
 from .logging_config import get_logger
+from .ast_utils import iter_nodes, _IMPORT_TYPES
 
 logger = get_logger(__name__)
 
 class DependencyAnalyzer:
     def __init__(self):
         self.logger = get_logger(__name__)
-        self.dependency_graph = nx.DiGraph()
+        # Plain dict adjacency: node -> type and source -> {target: edge type}.
+        # networkx is only needed when a caller asks for a graph object.
+        self.nodes: Dict[str, str] = {}
+        self.edges: Dict[str, Dict[str, str]] = {}
+        # networkx graph converted in bulk on first access, then grown in place
+        self._graph = None
         
     def analyze_imports(self, ast_tree: ast.AST, file_path: str) -> Dict:
         """Analyzes import statements and their relationships."""
         imports = []
-        for node in ast.walk(ast_tree):
-            if isinstance(node, (ast.Import, ast.ImportFrom)):
+        for node in iter_nodes(ast_tree):
+            if type(node) in _IMPORT_TYPES:
                 imports.append(self._process_import(node))
         return {'file': file_path, 'imports': imports}
     
@@ -37,23 +42,65 @@ class DependencyAnalyzer:
             
     def build_dependency_graph(self, imports_data: List[Dict]):
         """Builds a graph representation of project dependencies."""
+        nodes = self.nodes
+        edges = self.edges
+        # Once converted, the graph is updated alongside the dicts so callers
+        # holding it see new files and keep their own changes
+        graph = self._graph
         for file_data in imports_data:
             file_path = file_data['file']
-            self.dependency_graph.add_node(file_path, type='file')
+            nodes[file_path] = 'file'
+            file_edges = edges.setdefault(file_path, {})
+            if graph is not None:
+                graph.add_node(file_path, type='file')
             
             for imp in file_data['imports']:
                 module = imp.get('module')
                 if module:
-                    self.dependency_graph.add_node(module, type='module')
-                    self.dependency_graph.add_edge(file_path, module, type=imp['type'])
+                    nodes[module] = 'module'
+                    file_edges[module] = imp['type']
+                    if graph is not None:
+                        graph.add_node(module, type='module')
+                        graph.add_edge(file_path, module, type=imp['type'])
                 
                 # Add imported name if it exists
                 if 'name' in imp:
-                    self.dependency_graph.add_node(imp['name'], type='import')
-                    self.dependency_graph.add_edge(module, imp['name'], type='provides')
+                    name = imp['name']
+                    nodes[name] = 'import'
+                    if graph is not None:
+                        graph.add_node(name, type='import')
+                    # Relative imports have no module to hang the name on
+                    if module:
+                        edges.setdefault(module, {})[name] = 'provides'
+                        if graph is not None:
+                            graph.add_edge(module, name, type='provides')
         
         return self.dependency_graph
 
+    @property
+    def dependency_graph(self):
+        """networkx graph of the dependency data.
+
+        Converted on first access and kept up to date by build_dependency_graph,
+        so the same object is always returned and changes made to it persist.
+        """
+        if self._graph is None:
+            self._graph = self.to_networkx()
+        return self._graph
+
+    def to_networkx(self):
+        """Converts the adjacency dicts into a networkx DiGraph."""
+        import networkx as nx
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from((node, {'type': node_type}) for node, node_type in self.nodes.items())
+        graph.add_edges_from(
+            (source, target, {'type': edge_type})
+            for source, targets in self.edges.items()
+            for target, edge_type in targets.items()
+        )
+        return graph
+
     def analyze(self, ast_trees: Dict) -> Dict:
         """Analyzes dependencies in AST trees."""
         result = {}
@@ -0,0 +1,38 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson ships in the optional "speedups" extra
+    orjson = None
+
+# Both backends write compact JSON with non-str keys as strings. orjson writes
+# non-ASCII characters as raw UTF-8 while json escapes them as \uXXXX, so the
+# text can differ, but it always parses back to the same value.
+
+if orjson is not None:
+    def dumps(obj: Any) -> str:
+        """Serializes obj to a JSON string, using orjson when it is installed."""
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except orjson.JSONEncodeError:
+            # orjson rejects lone surrogates, which os.fsdecode() puts in names
+            # that are not valid UTF-8; json escapes them as \udcXX instead
+            return json.dumps(obj, separators=(',', ':'))
+
+    def loads(data) -> Any:
+        """Parses a JSON str or bytes value."""
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Also raised for the \udcXX escapes dumps falls back to; json
+            # accepts those and raises the same error type for invalid input
+            return json.loads(data)
+else:
+    def dumps(obj: Any) -> str:
+        """Serializes obj to a JSON string, using orjson when it is installed."""
+        return json.dumps(obj, separators=(',', ':'))
+
+    def loads(data) -> Any:
+        """Parses a JSON str or bytes value."""
+        return json.loads(data)
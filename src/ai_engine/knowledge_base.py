@@ -1,19 +1,61 @@
 import sqlite3
-import json
 import logging
+from itertools import chain
+import numpy as np
 from typing import Dict, List, Optional
 from .exceptions import KnowledgeBaseError
 import networkx as nx
 from .logging_config import get_logger
+from . import json_utils
 
 logger = logging.getLogger(__name__)
 
+_QUERY_SELECT = "SELECT pattern_type, pattern_data, frequency FROM code_patterns"
+
+# query_knowledge SQL keyed by (filter on pattern_type, has limit). Fixed strings
+# keep every variant in sqlite3's per-connection statement cache.
+_QUERY_SQL = {
+    (False, False): _QUERY_SELECT,
+    (True, False): _QUERY_SELECT + " WHERE pattern_type = ?",
+    (False, True): _QUERY_SELECT + " LIMIT ?",
+    (True, True): _QUERY_SELECT + " WHERE pattern_type = ? LIMIT ?",
+}
+
+# Embeddings are stored as raw float32 bytes, so cached vectors are bit-identical
+# to freshly computed ones.
+_EMBEDDING_DTYPE = np.float32
+
+# Stays under SQLite's default limit of 999 bound parameters per statement
+_EMBEDDING_LOOKUP_CHUNK = 500
+
+# Short chunks are padded to the full width, so every lookup reuses this one
+# cached statement instead of compiling a new IN (...) list per chunk size.
+_EMBEDDING_LOOKUP_SQL = (
+    "SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ("
+    + ','.join('?' * _EMBEDDING_LOOKUP_CHUNK) + ")"
+)
+
+def _path_column(file_path):
+    """Returns file_path in a form sqlite3 can bind as TEXT.
+
+    os.fsdecode() turns bytes that are not valid UTF-8 into lone surrogates,
+    which sqlite3 cannot encode; those bytes are stored as \\xNN escapes.
+    """
+    if type(file_path) is str and not file_path.isascii():
+        try:
+            file_path.encode('utf-8')
+        except UnicodeEncodeError:
+            return file_path.encode('utf-8', 'surrogateescape').decode('utf-8', 'backslashreplace')
+    return file_path
+
 class KnowledgeBase:
     def __init__(self, db_path: str = "knowledge.db"):
         self.logger = get_logger(__name__)
         self.db_path = db_path
         self.graph = nx.DiGraph()  # Initialize graph in constructor
-        self.conn = sqlite3.connect(self.db_path)  # Initialize database connection
+        # One long-lived connection; its statement cache keeps the parsed SQL
+        # for every query this class issues.
+        self.conn = sqlite3.connect(self.db_path, cached_statements=256)
         self._initialize_db()
     
     def __del__(self):
@@ -24,15 +66,35 @@ class KnowledgeBase:
     def _initialize_db(self):
         """Initializes database tables."""
         try:
+            # WAL with synchronous=NORMAL only syncs at checkpoints, not on every commit
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            # Wait on a locked database instead of failing with SQLITE_BUSY,
+            # keep ~20MB of pages cached and build temp indexes in memory
+            self.conn.execute("PRAGMA busy_timeout=5000")
+            self.conn.execute("PRAGMA cache_size=-20000")
+            self.conn.execute("PRAGMA temp_store=MEMORY")
             with self.conn:
                 self.conn.execute("""
                     CREATE TABLE IF NOT EXISTS code_patterns (
                         id INTEGER PRIMARY KEY,
                         pattern_type TEXT NOT NULL,
                         pattern_data TEXT NOT NULL,
-                        frequency INTEGER DEFAULT 1
+                        frequency INTEGER DEFAULT 1,
+                        file_path TEXT
                     )
                 """)
+                self._migrate_file_path_column()
+                
+                # Index the two lookup paths: by type (query_knowledge) and by file (get_patterns)
+                self.conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_patterns_type_freq
+                    ON code_patterns (pattern_type, frequency DESC)
+                """)
+                self.conn.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_patterns_file_path
+                    ON code_patterns (file_path)
+                """)
                 
                 self.conn.execute("""
                     CREATE TABLE IF NOT EXISTS dependencies (
@@ -42,26 +104,66 @@ class KnowledgeBase:
                         dependency_type TEXT NOT NULL
                     )
                 """)
+                
+                self._migrate_embeddings_table()
+                # Keyed by model fingerprint too: vectors from different models,
+                # dtypes or quantization settings are not interchangeable
+                self.conn.execute("""
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        model TEXT NOT NULL,
+                        hash BLOB NOT NULL,
+                        vector BLOB NOT NULL,
+                        PRIMARY KEY (model, hash)
+                    )
+                """)
             self.logger.debug("Database tables initialized")
         except Exception as e:
             self.logger.error(f"Database initialization failed: {str(e)}")
             raise KnowledgeBaseError(f"Failed to create tables: {str(e)}")
     
+    def _migrate_file_path_column(self):
+        """Adds and backfills file_path on databases created before it existed."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(code_patterns)")}
+        if 'file_path' in columns:
+            return
+        self.conn.execute("ALTER TABLE code_patterns ADD COLUMN file_path TEXT")
+        self.conn.execute(
+            "UPDATE code_patterns SET file_path = json_extract(pattern_data, '$.file')"
+        )
+        self.conn.execute("DROP INDEX IF EXISTS idx_patterns_file")
+        self.logger.info("Migrated code_patterns to a file_path column")
+
+    def _migrate_embeddings_table(self):
+        """Drops an embeddings table created before vectors were keyed by model.
+
+        Its rows cannot be attributed to a model, and they are recomputed on the
+        next scan, so they are discarded rather than migrated.
+        """
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(embeddings)")}
+        if columns and 'model' not in columns:
+            self.conn.execute("DROP TABLE embeddings")
+            self.logger.info("Dropped embeddings stored without a model fingerprint")
+
     def store_pattern(self, pattern: Dict):
         """Stores a code pattern in the database."""
         try:
             # Use pattern_type directly from input
             pattern_type = pattern.get('pattern_type')
-            pattern_data = json.dumps(pattern.get('data', {}))
+            data = pattern.get('data')
+            if data is None:
+                data = {}
+            # The file is also kept in its own column so lookups skip JSON parsing
+            file_path = _path_column(data.get('file')) if isinstance(data, dict) else None
+            pattern_data = json_utils.dumps(data)
             frequency = pattern.get('frequency', 1)
             
             with self.conn:
                 self.conn.execute(
                     """
-                    INSERT INTO code_patterns (pattern_type, pattern_data, frequency)
-                    VALUES (?, ?, ?)
+                    INSERT INTO code_patterns (pattern_type, pattern_data, frequency, file_path)
+                    VALUES (?, ?, ?, ?)
                     """,
-                    (pattern_type, pattern_data, frequency)
+                    (pattern_type, pattern_data, frequency, file_path)
                 )
             self.logger.debug(f"Stored pattern: {pattern_type}")
         except Exception as e:
@@ -75,16 +177,16 @@ class KnowledgeBase:
                 """
                 SELECT pattern_type, pattern_data, frequency 
                 FROM code_patterns 
-                WHERE json_extract(pattern_data, '$.file') = ?
+                WHERE file_path = ?
                 """,
-                (file_path,)
+                (_path_column(file_path),)
             )
             
             patterns = []
             for row in cursor:
                 patterns.append({
                     'type': row[0],
-                    'data': json.loads(row[1]),
+                    'data': json_utils.loads(row[1]),
                     'frequency': row[2]
                 })
             return patterns
@@ -105,9 +207,8 @@ class KnowledgeBase:
 
     def get_related_components(self, node):
         """Get all components related to a node"""
-        # Get both predecessors and successors
-        related = list(self.graph.predecessors(node)) + list(self.graph.successors(node))
-        return list(set(related))  # Remove duplicates
+        # Get both predecessors and successors, deduplicated in one pass
+        return list(set(chain(self.graph.predecessors(node), self.graph.successors(node))))
 
     def has_dependency(self, source, target):
         """Check if source depends on target"""
@@ -116,31 +217,20 @@ class KnowledgeBase:
     def query_knowledge(self, query: Dict) -> List[Dict]:
         """Query the knowledge base for patterns matching specific criteria."""
         try:
-            cursor = self.conn.cursor()
-            
-            # Build the SQL query based on the filter criteria
-            sql = "SELECT pattern_type, pattern_data, frequency FROM code_patterns"
+            has_type = 'pattern_type' in query
+            has_limit = 'limit' in query
             params = []
-            
-            # Add WHERE clause if pattern_type is specified
-            if 'pattern_type' in query:
-                sql += " WHERE pattern_type = ?"
+            if has_type:
                 params.append(query['pattern_type'])
-                
-            # Add LIMIT if specified
-            if 'limit' in query:
-                sql += " LIMIT ?"
+            if has_limit:
                 params.append(query['limit'])
-                
-            cursor.execute(sql, params)
-            rows = cursor.fetchall()
             
-            # Convert rows to list of dictionaries
+            # Convert rows to list of dictionaries as they are stepped
             results = []
-            for row in rows:
+            for row in self.conn.execute(_QUERY_SQL[has_type, has_limit], params):
                 results.append({
                     'pattern_type': row[0],
-                    'data': json.loads(row[1]),
+                    'data': json_utils.loads(row[1]),
                     'frequency': row[2]
                 })
                 
@@ -152,18 +242,58 @@ class KnowledgeBase:
     def store_patterns(self, patterns: List[Dict]) -> None:
         """Store multiple patterns in the database."""
         try:
-            for pattern in patterns:
-                # Convert the pattern format to match store_pattern expectations
-                converted_pattern = {
-                    'pattern_type': pattern['type'],
-                    'data': {
-                        'name': pattern['name'],
-                        'file': pattern['file']
-                    },
-                    'frequency': 1  # Default frequency for new patterns
-                }
-                self.store_pattern(converted_pattern)
+            # Same row layout as store_pattern, with new patterns at frequency 1
+            rows = [
+                (
+                    pattern['type'],
+                    json_utils.dumps({'name': pattern['name'], 'file': pattern['file']}),
+                    1,
+                    _path_column(pattern['file'])
+                )
+                for pattern in patterns
+            ]
+            # One transaction for the whole batch instead of a commit per row
+            with self.conn:
+                self.conn.executemany(
+                    """
+                    INSERT INTO code_patterns (pattern_type, pattern_data, frequency, file_path)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    rows
+                )
             self.logger.debug(f"Stored {len(patterns)} patterns")
         except Exception as e:
             self.logger.error(f"Failed to store patterns: {str(e)}")
             raise KnowledgeBaseError(f"Failed to store patterns: {str(e)}")
+
+    def get_embeddings(self, model: str, hashes: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Returns the embeddings stored by model for the given content hashes."""
+        try:
+            found = {}
+            for start in range(0, len(hashes), _EMBEDDING_LOOKUP_CHUNK):
+                chunk = list(hashes[start:start + _EMBEDDING_LOOKUP_CHUNK])
+                # Repeating a hash in the IN list does not change the result
+                chunk += chunk[-1:] * (_EMBEDDING_LOOKUP_CHUNK - len(chunk))
+                for key, vector in self.conn.execute(_EMBEDDING_LOOKUP_SQL, [model, *chunk]):
+                    found[key] = np.frombuffer(vector, dtype=_EMBEDDING_DTYPE)
+            return found
+        except Exception as e:
+            self.logger.error(f"Failed to load embeddings: {str(e)}")
+            raise KnowledgeBaseError(f"Failed to load embeddings: {str(e)}")
+
+    def store_embeddings(self, model: str, embeddings: Dict[bytes, np.ndarray]) -> None:
+        """Stores model's embeddings keyed by content hash, replacing existing entries."""
+        try:
+            rows = [
+                (model, key, np.asarray(vector, dtype=_EMBEDDING_DTYPE).tobytes())
+                for key, vector in embeddings.items()
+            ]
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                    rows
+                )
+            self.logger.debug(f"Stored {len(rows)} embeddings")
+        except Exception as e:
+            self.logger.error(f"Failed to store embeddings: {str(e)}")
+            raise KnowledgeBaseError(f"Failed to store embeddings: {str(e)}")
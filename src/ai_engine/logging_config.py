@@ -1,17 +1,23 @@
 import logging
 import os
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
-import json
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+import atexit
+import queue
 import uuid
 from typing import Optional
+from . import json_utils
 
 class StructuredLogger(logging.Logger):
     def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, **kwargs):
         if extra is None:
             extra = {}
         if 'correlation_id' not in extra:
-            extra['correlation_id'] = getattr(self, 'correlation_id', str(uuid.uuid4()))
+            correlation_id = getattr(self, 'correlation_id', None)
+            if correlation_id is None:
+                # Generated once per logger, not once per record
+                correlation_id = self.correlation_id = str(uuid.uuid4())
+            extra['correlation_id'] = correlation_id
         super()._log(level, msg, args, exc_info, extra, stack_info)
 
 class JsonFormatter(logging.Formatter):
@@ -25,13 +31,39 @@ class JsonFormatter(logging.Formatter):
         }
         if record.exc_info:
             log_data['exception'] = self.formatException(record.exc_info)
-        return json.dumps(log_data)
+        return json_utils.dumps(log_data)
+
+class _RecordQueueHandler(QueueHandler):
+    """Enqueues records as they are, so JsonFormatter still sees exc_info.
+
+    The stock prepare() formats the message and clears exc_info, which would
+    drop the 'exception' field. The listener runs in this process, so the
+    record does not need to be made picklable.
+    """
+    def prepare(self, record):
+        return record
+
+class _QueueListener(QueueListener):
+    """QueueListener whose stop() is safe to call more than once."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.running = False
+
+    def start(self):
+        super().start()
+        self.running = True
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            super().stop()
 
 def setup_logging(
     log_dir: str = "logs",
     log_level: Optional[str] = None,
     max_bytes: int = 10485760,  # 10MB
-    backup_count: int = 5
+    backup_count: int = 5,
+    use_queue: bool = False
 ) -> logging.Logger:
     """
     Configure logging for the AI engine with rotation and structured output.
@@ -41,6 +73,8 @@ def setup_logging(
         log_level: Override default log level (reads from ENV if None)
         max_bytes: Maximum size of each log file
         backup_count: Number of backup files to keep
+        use_queue: Hand records to a background thread that writes them, so
+            logging calls never wait on file or console I/O
     """
     
     # Create logs directory if it doesn't exist
@@ -62,6 +96,10 @@ def setup_logging(
     logger.setLevel(numeric_level)
     
     # Clear any existing handlers
+    previous_listener = getattr(logger, 'queue_listener', None)
+    if previous_listener is not None:
+        previous_listener.stop()
+        logger.queue_listener = None
     logger.handlers = []
     
     # Create rotating file handler
@@ -79,8 +117,18 @@ def setup_logging(
     ))
     
     # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    if use_queue:
+        log_queue = queue.Queue(-1)
+        listener = _QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        listener.start()
+        atexit.register(listener.stop)  # Flush queued records on exit
+        logger.queue_listener = listener  # Keeps the listener reachable for stop()
+        logger.addHandler(_RecordQueueHandler(log_queue))
+    else:
+        logger.addHandler(file_handler)
+        logger.addHandler(console_handler)
     
     logger.info("Logging system initialized", extra={
         'correlation_id': str(uuid.uuid4()),
@@ -1,64 +1,248 @@
 import logging
+import hashlib
+import contextlib
+from collections import OrderedDict
 import numpy as np
-import torch
 import ast
-from sklearn.cluster import DBSCAN
-from typing import List, Dict
+from typing import List, Dict, Optional
 from .exceptions import PatternAnalysisError
 from .logging_config import get_logger
-from transformers import AutoModel, AutoTokenizer
+from .ast_utils import iter_nodes
+
+# torch, transformers and scikit-learn ship in the optional "ai" extra and take
+# seconds to import, so they are imported inside the methods that use them.
 
 logger = get_logger(__name__)
 
+# Number of code blocks encoded per CodeBERT forward pass.
+_EMBEDDING_BATCH_SIZE = 32
+# Most embeddings kept in memory (~3 KB each for CodeBERT's 768 float32s).
+_EMBEDDING_CACHE_SIZE = 10000
+
 class PatternRecognizer:
-    def __init__(self, model=None):
+    def __init__(
+        self,
+        model=None,
+        half_precision: bool = False,
+        compile_model: bool = False,
+        quantize: bool = False,
+        device: Optional[str] = None,
+        embedding_store=None,
+        model_name: str = "microsoft/codebert-base"
+    ):
         self.logger = get_logger(__name__)
+        self.model_name = model_name
+        # Embeddings keyed by a hash of the code block, so unchanged code is
+        # not re-encoded on the next scan. Least recently used entries are
+        # evicted beyond _EMBEDDING_CACHE_SIZE.
+        self._embedding_cache: Dict[bytes, np.ndarray] = OrderedDict()
+        # Optional persistent layer behind the in-memory cache (e.g. a KnowledgeBase).
+        # Only _get_embeddings uses it; analyze() does not embed code blocks.
+        self.embedding_store = embedding_store
+        try:
+            # Fail fast with the install hint rather than on the first encode/cluster
+            import torch  # noqa: F401
+            import sklearn  # noqa: F401
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise PatternAnalysisError(
+                "PatternRecognizer requires torch, transformers and scikit-learn; "
+                "install them with: pip install github-review-agent[ai]"
+            )
+        if half_precision and quantize:
+            raise PatternAnalysisError("half_precision and quantize cannot be combined")
         if model:
             self.embedding_model = model
             # Initialize tokenizer separately when model is provided
-            self.tokenizer = AutoTokenizer.from_pretrained("microsoft/codebert-base")
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         else:
             self._initialize_embedding_model()
+        self._prepare_for_inference(half_precision, compile_model, quantize, device)
     
     def _initialize_embedding_model(self):
         """Initialize both model and tokenizer"""
         try:
-            model_name = "microsoft/codebert-base"
+            from transformers import AutoModel, AutoTokenizer
+            model_name = self.model_name
             self.embedding_model = AutoModel.from_pretrained(model_name)
             self.tokenizer = AutoTokenizer.from_pretrained(model_name)
         except Exception as e:
             self.logger.error(f"Failed to initialize embedding model: {str(e)}")
             raise PatternAnalysisError(f"Model initialization failed: {str(e)}")
+
+    def _prepare_for_inference(
+        self,
+        half_precision: bool,
+        compile_model: bool,
+        quantize: bool,
+        device: Optional[str]
+    ):
+        """Places the model on its device and optionally casts, quantizes and/or compiles it."""
+        import torch
+        if device is None:
+            # Dynamic int8 quantization only has CPU kernels
+            device = 'cuda' if torch.cuda.is_available() and not quantize else 'cpu'
+        device_type = torch.device(device).type
+        if quantize and device_type != 'cpu':
+            raise PatternAnalysisError("quantize is only supported on the cpu device")
+        self.device = device
+        # fp16 autocast uses CUDA tensor cores (other backends such as mps are
+        # left alone); bf16 weights are left as they are
+        self._autocast = device_type == 'cuda' and not half_precision
+        # Names the numerics behind each embedding, so a shared embedding store
+        # never serves vectors computed by another model or precision
+        self._model_fingerprint = (
+            f"{self.model_name}|dtype={'bfloat16' if half_precision else 'float32'}"
+            f"|quantize={quantize}|autocast={self._autocast}"
+        )
+        self.embedding_model.eval()
+        if device != 'cpu':
+            self.embedding_model.to(device)
+        if half_precision:
+            # Halves weight memory traffic; embeddings are cast back to float32
+            self.embedding_model.to(dtype=torch.bfloat16)
+        if quantize:
+            # int8 weights for the Linear layers, which dominate CPU inference time.
+            # In place, so a caller holding the model (CodeAnalyzer.model) does not
+            # keep a second full-precision copy alive.
+            self.embedding_model = torch.ao.quantization.quantize_dynamic(
+                self.embedding_model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+            )
+        if compile_model:
+            self._compile_model()
+
+    def _compile_model(self):
+        """Compiles the model and warms it up, staying eager if either step fails."""
+        import torch
+        try:
+            # Batches vary in length, so compile for dynamic shapes up front
+            compiled = torch.compile(self.embedding_model, dynamic=True)
+            # Compilation is lazy: a warm-up forward pays for it here, under the
+            # same autocast state as real batches, and surfaces backend errors
+            # before any real input arrives
+            with torch.inference_mode(), self._autocast_context():
+                compiled(**self._tokenize(["def warm_up():\n    pass"]))
+        except Exception as e:
+            self.logger.warning(f"torch.compile failed, using the eager model: {str(e)}")
+            return
+        self.embedding_model = compiled
+
+    def _tokenize(self, codes: List[str]) -> Dict:
+        """Tokenizes a batch and moves it to the model's device."""
+        inputs = self.tokenizer(
+            codes,
+            padding=True,
+            truncation=True,
+            return_tensors="pt",
+            max_length=512
+        )
+        if self.device != 'cpu':
+            inputs = {name: tensor.to(self.device) for name, tensor in inputs.items()}
+        return inputs
+
+    def _autocast_context(self):
+        """fp16 autocast on the GPU, a no-op context otherwise."""
+        if self._autocast:
+            import torch
+            return torch.autocast(device_type='cuda', dtype=torch.float16)
+        return contextlib.nullcontext()
     
     def _get_embeddings(self, code_blocks: List[str]) -> np.ndarray:
-        """Generates embeddings for code blocks."""
+        """Generates embeddings for code blocks.
+
+        Previously seen blocks are served from the cache, then from the
+        embedding store if one is set. The rest are sorted by length and
+        encoded in batches, so each forward pass only pads up to the longest
+        block in its batch, and are written back to the store.
+        """
         try:
-            embeddings = []
-            for code in code_blocks:
-                # Use self.tokenizer instead of self.embedding_model.tokenizer
-                inputs = self.tokenizer(
-                    code,
-                    padding=True,
-                    truncation=True,
-                    return_tensors="pt",
-                    max_length=512
-                )
-                
-                # Generate embeddings
-                with torch.no_grad():
-                    outputs = self.embedding_model(**inputs)
-                    embedding = outputs.last_hidden_state[:, 0, :].numpy()
-                    embeddings.append(embedding[0])
-                    
-            return np.array(embeddings)
+            cache = self._embedding_cache
+            keys = [
+                hashlib.blake2b(block.encode('utf-8'), digest_size=16).digest()
+                for block in code_blocks
+            ]
+            # Embeddings for this call, held here since the cache may evict them
+            found = {}
+            # One entry per distinct uncached block
+            misses = {}
+            for key, block in zip(keys, code_blocks):
+                if key in found or key in misses:
+                    continue
+                embedding = cache.get(key)
+                if embedding is None:
+                    misses[key] = block
+                else:
+                    cache.move_to_end(key)
+                    found[key] = embedding
+            store = self.embedding_store
+            if misses and store is not None:
+                stored = store.get_embeddings(self._model_fingerprint, list(misses))
+                found.update(stored)
+                self._cache_embeddings(stored)
+                for key in stored:
+                    del misses[key]
+            if misses:
+                encoded = self._encode_blocks(misses)
+                found.update(encoded)
+                if store is not None:
+                    store.store_embeddings(self._model_fingerprint, encoded)
+            # One contiguous float32 matrix, the dtype the clustering step works in
+            return np.array([found[key] for key in keys], dtype=np.float32)
         except Exception as e:
             self.logger.error(f"Embedding generation failed: {str(e)}")
             raise PatternAnalysisError(f"Failed to generate embeddings: {str(e)}")
+
+    def _encode_blocks(self, blocks: Dict[bytes, str]) -> Dict[bytes, np.ndarray]:
+        """Runs the model over uncached blocks, caches and returns their embeddings."""
+        encoded = {}
+        order = sorted(blocks, key=lambda key: len(blocks[key]))
+        for start in range(0, len(order), _EMBEDDING_BATCH_SIZE):
+            self._encode_batch(order[start:start + _EMBEDDING_BATCH_SIZE], blocks, encoded)
+        self._cache_embeddings(encoded)
+        return encoded
+
+    def _cache_embeddings(self, embeddings: Dict[bytes, np.ndarray]):
+        """Adds embeddings to the cache, evicting the least recently used beyond its size."""
+        cache = self._embedding_cache
+        cache.update(embeddings)
+        while len(cache) > _EMBEDDING_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    def _encode_batch(self, batch: List[bytes], blocks: Dict[bytes, str], encoded: Dict):
+        """Encodes one batch, splitting it in half if the GPU runs out of memory."""
+        import torch
+        try:
+            inputs = self._tokenize([blocks[key] for key in batch])
+            # The [CLS] token's hidden state is the block embedding
+            with torch.inference_mode(), self._autocast_context():
+                outputs = self.embedding_model(**inputs)
+                cls_embeddings = outputs.last_hidden_state[:, 0, :].float().cpu().numpy()
+        except torch.cuda.OutOfMemoryError:
+            if len(batch) == 1:
+                raise
+            out_of_memory = True
+        else:
+            out_of_memory = False
+
+        if out_of_memory:
+            # Retried outside the except block so the failed batch's tensors,
+            # still referenced by the traceback, can be freed first
+            self.logger.warning(f"Out of memory encoding {len(batch)} blocks; splitting the batch")
+            if self.device != 'cpu':
+                torch.cuda.empty_cache()
+            half = len(batch) // 2
+            self._encode_batch(batch[:half], blocks, encoded)
+            self._encode_batch(batch[half:], blocks, encoded)
+            return
+        for key, embedding in zip(batch, cls_embeddings):
+            encoded[key] = embedding
     
     def _cluster_patterns(self, embeddings: np.ndarray) -> np.ndarray:
         """Clusters similar code patterns."""
         try:
-            clustering = DBSCAN(eps=0.3, min_samples=2)
+            from sklearn.cluster import DBSCAN
+            # Neighbourhood queries are independent per point, so spread them over all cores
+            clustering = DBSCAN(eps=0.3, min_samples=2, n_jobs=-1)
             clusters = clustering.fit_predict(embeddings)
             self.logger.info(f"Identified {len(set(clusters))} pattern clusters")
             return clusters
@@ -72,8 +256,9 @@ class PatternRecognizer:
         for file_path, tree_info in ast_trees.items():
             tree = tree_info['ast']
             class_scope = None  # Track if we're inside a class
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
+            for node in iter_nodes(tree):
+                node_type = type(node)
+                if node_type is ast.ClassDef:
                     class_scope = node
                     patterns.append({
                         'type': 'class_definition',
@@ -85,7 +270,7 @@ class PatternRecognizer:
                     })
                     # Add methods within the class
                     for item in node.body:
-                        if isinstance(item, ast.FunctionDef):
+                        if type(item) is ast.FunctionDef:
                             patterns.append({
                                 'type': 'method_definition',
                                 'name': item.name,
@@ -97,7 +282,7 @@ class PatternRecognizer:
                                 },
                                 'frequency': 1
                             })
-                elif isinstance(node, ast.FunctionDef) and not class_scope:
+                elif node_type is ast.FunctionDef and not class_scope:
                     pattern = {
                         'type': 'function_definition',
                         'name': node.name,
@@ -110,7 +295,7 @@ class PatternRecognizer:
                         pattern['type'] = 'decorator'
                         pattern['pattern_type'] = 'decorator'
                     patterns.append(pattern)
-                if isinstance(node, ast.ClassDef):
+                if node_type is ast.ClassDef:
                     class_scope = None  # Reset class scope when exiting class
         return patterns
     
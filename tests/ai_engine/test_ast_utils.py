@@ -0,0 +1,28 @@
+import unittest
+import ast
+from src.ai_engine.ast_utils import iter_nodes
+
+class TestAstUtils(unittest.TestCase):
+    def setUp(self):
+        self.tree = ast.parse(
+            'import os\n'
+            'class A:\n'
+            '    def method(self, x=1):\n'
+            '        return [y for y in x]\n'
+            'def helper():\n'
+            '    from sys import path\n'
+        )
+
+    def test_iter_nodes_visits_same_nodes_as_ast_walk(self):
+        walked = list(ast.walk(self.tree))
+        iterated = list(iter_nodes(self.tree))
+        self.assertEqual(len(iterated), len(walked))
+        self.assertEqual(set(map(id, iterated)), set(map(id, walked)))
+
+    def test_iter_nodes_yields_in_source_order(self):
+        names = [
+            node.name for node in iter_nodes(self.tree)
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef))
+        ]
+        self.assertEqual(names, ['A', 'method', 'helper'])
+        self.assertIs(next(iter_nodes(self.tree)), self.tree)
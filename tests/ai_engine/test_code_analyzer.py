@@ -3,15 +3,19 @@ from unittest.mock import Mock, patch
 import os
 import ast
 import shutil
+import time
+import pytest
+from src.ai_engine import code_analyzer
 from src.ai_engine.code_analyzer import CodeAnalyzer
 from src.ai_engine.exceptions import CodeParsingError
 
 class TestCodeAnalyzer(unittest.TestCase):
     def setUp(self):
+        pytest.importorskip("torch")
         # Mock the transformer models to avoid loading them during tests
         with patch('transformers.AutoTokenizer.from_pretrained'), \
              patch('transformers.AutoModel.from_pretrained'):
-            self.analyzer = CodeAnalyzer()
+            self.analyzer = CodeAnalyzer(device='cpu')
         
         # Create test directory structure
         self.test_dir = "test_repo"
@@ -40,6 +44,23 @@ class TestCodeAnalyzer(unittest.TestCase):
         self.assertTrue(any(f.endswith('main.py') for f in files))
         self.assertTrue(any(f.endswith('utils.py') for f in files))
 
+    def test_collect_files_skips_vendored_dirs(self):
+        for skipped in ('.git', 'node_modules', '.venv', '__pycache__'):
+            os.makedirs(os.path.join(self.test_dir, skipped), exist_ok=True)
+            with open(os.path.join(self.test_dir, skipped, 'vendored.py'), 'w') as f:
+                f.write('x = 1\n')
+
+        files = self.analyzer._collect_files(self.test_dir)
+        self.assertEqual(len(files), 2)
+
+    def test_collect_files_ignores_extensionless_names(self):
+        for name in ('py', 'h', 'Makefile', '.py'):
+            with open(os.path.join(self.test_dir, name), 'w') as f:
+                f.write('x = 1\n')
+
+        files = self.analyzer._collect_files(self.test_dir)
+        self.assertEqual(len(files), 2)
+
     def test_parse_files(self):
         self.analyzer.files = [
             os.path.join(self.test_dir, 'main.py'),
@@ -52,6 +73,46 @@ class TestCodeAnalyzer(unittest.TestCase):
             self.assertIsInstance(tree_data['ast'], ast.AST)
             self.assertIsInstance(tree_data['content'], str)
 
+    def test_parse_files_reuses_unchanged_files(self):
+        """Test that a rescan only re-parses modified files"""
+        self.analyzer.files = [
+            os.path.join(self.test_dir, 'main.py'),
+            os.path.join(self.test_dir, 'utils.py')
+        ]
+        first = self.analyzer._parse_files()
+
+        utils_path = os.path.join(self.test_dir, 'utils.py')
+        with open(utils_path, 'w') as f:
+            f.write('import os\nimport sys\n')
+        second = self.analyzer._parse_files()
+
+        main_path = os.path.join(self.test_dir, 'main.py')
+        self.assertIs(second[main_path], first[main_path])
+        self.assertIsNot(second[utils_path], first[utils_path])
+        self.assertIn('import sys', second[utils_path]['content'])
+
+    def test_parse_files_honours_coding_cookie(self):
+        """Test that non-UTF-8 sources with a coding declaration parse"""
+        latin1_path = os.path.join(self.test_dir, 'latin1.py')
+        with open(latin1_path, 'wb') as f:
+            f.write('# -*- coding: latin-1 -*-\nname = "caf\u00e9"\n'.encode('latin-1'))
+
+        self.analyzer.files = [latin1_path]
+        ast_trees = self.analyzer._parse_files()
+
+        self.assertIn('caf\u00e9', ast_trees[latin1_path]['content'])
+
+    def test_parse_files_normalises_line_endings(self):
+        """Test that CRLF and CR line endings read back as LF"""
+        crlf_path = os.path.join(self.test_dir, 'crlf.py')
+        with open(crlf_path, 'wb') as f:
+            f.write(b'x = 1\r\ny = 2\rz = 3\r\n')
+
+        self.analyzer.files = [crlf_path]
+        ast_trees = self.analyzer._parse_files()
+
+        self.assertEqual(ast_trees[crlf_path]['content'], 'x = 1\ny = 2\nz = 3\n')
+
     def test_analyze_dependencies(self):
         # Mock AST trees
         self.analyzer.ast_trees = {
@@ -65,6 +126,24 @@ class TestCodeAnalyzer(unittest.TestCase):
         self.assertIn('utils.py', deps)
         self.assertTrue(len(deps['utils.py']['imports']) > 0)
 
+    def test_analyze_dependencies_reuses_unchanged_trees(self):
+        """Test that imports are only re-extracted for new trees"""
+        unchanged = {'ast': ast.parse('import os'), 'content': 'import os'}
+        self.analyzer.ast_trees = {
+            'a.py': unchanged,
+            'b.py': {'ast': ast.parse('import sys'), 'content': 'import sys'}
+        }
+        first = self.analyzer._analyze_dependencies()
+
+        self.analyzer.ast_trees = {
+            'a.py': unchanged,
+            'b.py': {'ast': ast.parse('import json'), 'content': 'import json'}
+        }
+        second = self.analyzer._analyze_dependencies()
+
+        self.assertIs(second['a.py']['imports'], first['a.py']['imports'])
+        self.assertEqual(second['b.py']['imports'], [{'module': 'json', 'type': 'import'}])
+
     def test_build_knowledge_representation(self):
         # Setup test data
         self.analyzer.files = [
@@ -120,6 +199,30 @@ class TestCodeAnalyzer(unittest.TestCase):
         with self.assertRaises(CodeParsingError):
             self.analyzer._parse_files()
 
+    def test_parse_files_stops_at_first_invalid_file(self):
+        """Test that files still queued behind a failing one are not parsed"""
+        paths = []
+        for i in range(20):
+            paths.append(os.path.join(self.test_dir, f'module_{i}.py'))
+            with open(paths[-1], 'w') as f:
+                f.write('x = 1\n')
+        parsed = []
+
+        def read_and_parse(file_path):
+            if file_path == paths[0]:
+                raise SyntaxError("invalid syntax")
+            parsed.append(file_path)
+            time.sleep(0.05)
+            return {'ast': ast.parse(''), 'content': ''}
+
+        self.analyzer.files = paths
+        with patch.object(code_analyzer, '_PARSE_WORKERS', 1), \
+             patch.object(code_analyzer, '_read_and_parse', side_effect=read_and_parse):
+            with self.assertRaises(CodeParsingError):
+                self.analyzer._parse_files()
+
+        self.assertLessEqual(len(parsed), 1)
+
     def test_analyze_dependencies_with_complex_imports(self):
         """Test dependency analysis with various import types"""
         self.analyzer.ast_trees = {
@@ -62,3 +62,46 @@ class TestDependencyAnalyzer(unittest.TestCase):
         expected_nodes = {'main.py', 'utils.py', 'os', 'sys', 'helper', 'utils'}
         self.assertEqual(set(graph.nodes), expected_nodes)
 
+    def test_build_dependency_graph_adjacency(self):
+        imports_data = [
+            {
+                'file': 'main.py',
+                'imports': [
+                    {'type': 'import', 'module': 'os'},
+                    {'type': 'importfrom', 'module': 'utils', 'name': 'helper'},
+                    {'type': 'importfrom', 'module': None, 'name': 'sibling'}
+                ]
+            }
+        ]
+
+        graph = self.analyzer.build_dependency_graph(imports_data)
+
+        self.assertEqual(self.analyzer.nodes['main.py'], 'file')
+        self.assertEqual(self.analyzer.nodes['sibling'], 'import')
+        self.assertEqual(self.analyzer.edges['main.py'], {'os': 'import', 'utils': 'importfrom'})
+        self.assertEqual(self.analyzer.edges['utils'], {'helper': 'provides'})
+        self.assertEqual(graph.edges['utils', 'helper']['type'], 'provides')
+        self.assertEqual(graph.nodes['os']['type'], 'module')
+
+    def test_dependency_graph_grows_in_place(self):
+        self.analyzer.build_dependency_graph([{'file': 'a.py', 'imports': []}])
+        graph = self.analyzer.dependency_graph
+        graph.add_node('annotated')
+
+        self.assertIs(self.analyzer.dependency_graph, graph)
+
+        for file_path in ('b.py', 'c.py'):
+            rebuilt = self.analyzer.build_dependency_graph([{
+                'file': file_path,
+                'imports': [{'type': 'importfrom', 'module': 'utils', 'name': 'helper'}]
+            }])
+            self.assertIs(rebuilt, graph)
+        self.assertEqual(
+            set(graph.nodes), {'a.py', 'b.py', 'c.py', 'utils', 'helper', 'annotated'}
+        )
+        self.assertEqual(graph.edges['c.py', 'utils']['type'], 'importfrom')
+        self.assertEqual(graph.edges['utils', 'helper']['type'], 'provides')
+        self.assertEqual(graph.nodes['helper']['type'], 'import')
+        # Matches a fresh bulk conversion of the same data, apart from the annotation
+        fresh = self.analyzer.to_networkx()
+        self.assertEqual(set(fresh.edges), set(graph.edges))
@@ -0,0 +1,36 @@
+import unittest
+import importlib
+import os
+import sys
+from unittest.mock import patch
+from src.ai_engine import json_utils
+
+class TestJsonUtils(unittest.TestCase):
+    def test_round_trip(self):
+        data = {'name': 'test_func', 'params': ['a', 'b'], 'line': 3}
+        encoded = json_utils.dumps(data)
+        self.assertIsInstance(encoded, str)
+        self.assertEqual(json_utils.loads(encoded), data)
+
+    def test_stdlib_fallback_matches(self):
+        data = {'name': 'test_func', 1: None}
+        try:
+            with patch.dict(sys.modules, {'orjson': None}):
+                fallback = importlib.reload(json_utils)
+                self.assertIsNone(fallback.orjson)
+                self.assertEqual(fallback.dumps(data), '{"name":"test_func","1":null}')
+        finally:
+            # Outside patch.dict, so orjson is importable again
+            importlib.reload(json_utils)
+        self.assertIsNotNone(json_utils.orjson)
+        self.assertEqual(json_utils.dumps(data), '{"name":"test_func","1":null}')
+
+    def test_non_ascii_round_trips_on_both_backends(self):
+        data = {'name': 'café', 'file': os.fsdecode(b'caf\xe9.py')}
+        try:
+            with patch.dict(sys.modules, {'orjson': None}):
+                fallback = importlib.reload(json_utils)
+                self.assertEqual(fallback.loads(fallback.dumps(data)), data)
+        finally:
+            importlib.reload(json_utils)
+        self.assertEqual(json_utils.loads(json_utils.dumps(data)), data)
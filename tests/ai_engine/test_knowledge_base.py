@@ -1,7 +1,10 @@
 import unittest
 import os
 import json
+import sqlite3
+import numpy as np
 from src.ai_engine.knowledge_base import KnowledgeBase
+from src.ai_engine.exceptions import KnowledgeBaseError
 
 class TestKnowledgeBase(unittest.TestCase):
     def setUp(self):
@@ -30,6 +33,46 @@ class TestKnowledgeBase(unittest.TestCase):
         """)
         self.assertIsNotNone(cursor.fetchone())
 
+    def test_connection_pragmas(self):
+        pragma = lambda name: self.kb.conn.execute(f"PRAGMA {name}").fetchone()[0]
+        self.assertEqual(pragma('journal_mode'), 'wal')
+        self.assertEqual(pragma('busy_timeout'), 5000)
+        self.assertEqual(pragma('cache_size'), -20000)
+
+    def test_get_patterns_uses_file_index(self):
+        plan = self.kb.conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT pattern_type, pattern_data, frequency
+            FROM code_patterns
+            WHERE file_path = ?
+        """, ('test.py',)).fetchall()
+        self.assertTrue(any('idx_patterns_file_path' in row[-1] for row in plan))
+
+    def test_file_path_column_migration(self):
+        """Test that an old database gains a backfilled file_path column"""
+        self.kb.conn.close()
+        os.remove(self.test_db)
+        conn = sqlite3.connect(self.test_db)
+        with conn:
+            conn.execute("""
+                CREATE TABLE code_patterns (
+                    id INTEGER PRIMARY KEY,
+                    pattern_type TEXT NOT NULL,
+                    pattern_data TEXT NOT NULL,
+                    frequency INTEGER DEFAULT 1
+                )
+            """)
+            conn.execute(
+                "INSERT INTO code_patterns (pattern_type, pattern_data) VALUES (?, ?)",
+                ('class', json.dumps({'name': 'OldClass', 'file': 'old.py'}))
+            )
+        conn.close()
+
+        self.kb = KnowledgeBase(self.test_db)
+        patterns = self.kb.get_patterns('old.py')
+        self.assertEqual(len(patterns), 1)
+        self.assertEqual(patterns[0]['data']['name'], 'OldClass')
+
     def test_store_pattern(self):
         test_pattern = {
             'pattern_type': 'function_definition',
@@ -51,6 +94,19 @@ class TestKnowledgeBase(unittest.TestCase):
             {'name': 'test_func', 'params': []}
         )
 
+    def test_store_pattern_without_data(self):
+        self.kb.store_pattern({'pattern_type': 'decorator', 'data': None})
+
+        results = self.kb.query_knowledge({'pattern_type': 'decorator'})
+        self.assertEqual(results[0]['data'], {})
+
+    def test_store_pattern_keeps_falsy_data(self):
+        for data in ([], '', 0):
+            self.kb.store_pattern({'pattern_type': 'falsy', 'data': data})
+
+        results = self.kb.query_knowledge({'pattern_type': 'falsy'})
+        self.assertEqual([r['data'] for r in results], [[], '', 0])
+
     def test_query_knowledge(self):
         # Store test patterns
         patterns = [
@@ -95,6 +151,71 @@ class TestKnowledgeBase(unittest.TestCase):
         self.assertEqual(retrieved[0]['type'], 'class')
         self.assertEqual(retrieved[1]['type'], 'function')
 
+    def test_store_patterns_with_undecodable_name(self):
+        name = os.fsdecode(b'caf\xe9')
+        self.kb.store_patterns([{'type': 'function', 'name': name, 'file': 'test.py'}])
+
+        patterns = self.kb.get_patterns('test.py')
+        self.assertEqual(patterns[0]['data']['name'], name)
+
+    def test_undecodable_file_path(self):
+        """Test that a surrogate-escaped file name is stored and found again"""
+        path = os.fsdecode(b'caf\xe9.py')
+        self.kb.store_patterns([{'type': 'class', 'name': 'Cafe', 'file': path}])
+        self.kb.store_pattern({'pattern_type': 'function', 'data': {'name': 'f', 'file': path}})
+
+        patterns = self.kb.get_patterns(path)
+        self.assertEqual([p['data']['name'] for p in patterns], ['Cafe', 'f'])
+        self.assertEqual(patterns[0]['data']['file'], path)
+
+    def test_store_patterns_is_atomic(self):
+        """Test that a malformed pattern stores nothing from the batch"""
+        patterns = [
+            {'type': 'class', 'name': 'TestClass', 'file': 'test.py'},
+            {'type': 'function', 'file': 'test.py'}
+        ]
+        with self.assertRaises(KnowledgeBaseError):
+            self.kb.store_patterns(patterns)
+
+        self.assertEqual(self.kb.get_patterns('test.py'), [])
+
+    def test_store_and_get_embeddings(self):
+        vectors = {
+            b'a' * 16: np.arange(4, dtype=np.float32),
+            b'b' * 16: np.ones(4, dtype=np.float32)
+        }
+        self.kb.store_embeddings('model-a', vectors)
+
+        found = self.kb.get_embeddings('model-a', [b'a' * 16, b'c' * 16])
+        self.assertEqual(list(found), [b'a' * 16])
+        np.testing.assert_array_equal(found[b'a' * 16], vectors[b'a' * 16])
+        # Another model's vectors for the same content are kept apart
+        self.assertEqual(self.kb.get_embeddings('model-b', [b'a' * 16]), {})
+
+    def test_get_embeddings_across_lookup_chunks(self):
+        keys = [i.to_bytes(16, 'big') for i in range(1203)]
+        self.kb.store_embeddings('model-a', {key: np.ones(4) for key in keys})
+
+        # Spans a full chunk and a padded partial one
+        found = self.kb.get_embeddings('model-a', keys)
+        self.assertEqual(sorted(found), keys)
+
+    def test_embeddings_model_column_migration(self):
+        """Test that embeddings stored without a model fingerprint are dropped"""
+        self.kb.conn.close()
+        os.remove(self.test_db)
+        conn = sqlite3.connect(self.test_db)
+        with conn:
+            conn.execute("CREATE TABLE embeddings (hash BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+            conn.execute("INSERT INTO embeddings VALUES (?, ?)", (b'a' * 16, b'\0' * 16))
+        conn.close()
+
+        self.kb = KnowledgeBase(self.test_db)
+
+        columns = {row[1] for row in self.kb.conn.execute("PRAGMA table_info(embeddings)")}
+        self.assertIn('model', columns)
+        self.assertEqual(self.kb.get_embeddings('model-a', [b'a' * 16]), {})
+
     def test_knowledge_graph_operations(self):
         """Test knowledge graph building and querying"""
         nodes = [
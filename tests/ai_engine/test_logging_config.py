@@ -3,7 +3,8 @@ import os
 import json
 import logging
 import time
-from src.ai_engine.logging_config import setup_logging, get_logger, JsonFormatter
+from logging.handlers import QueueHandler
+from src.ai_engine.logging_config import setup_logging, get_logger, JsonFormatter, StructuredLogger
 
 class TestLoggingConfig(unittest.TestCase):
     def setUp(self):
@@ -57,11 +58,36 @@ class TestLoggingConfig(unittest.TestCase):
         log_record = json.loads(handler.records[0])
         self.assertEqual(log_record['message'], test_message)
 
+    def test_json_formatting_undecodable_path(self):
+        """Test that a surrogate-escaped file name still produces a JSON record"""
+        path = os.fsdecode(b'/repo/caf\xe9.py')
+        record = logging.LogRecord(
+            'test', logging.ERROR, __file__, 1, "Failed to parse %s", (path,), None
+        )
+
+        log_record = json.loads(JsonFormatter().format(record))
+        self.assertEqual(log_record['message'], f"Failed to parse {path}")
+
     def test_correlation_id(self):
         logger1 = get_logger("test1")
         logger2 = get_logger("test2")
         self.assertNotEqual(logger1.correlation_id, logger2.correlation_id)
 
+    def test_correlation_id_generated_once_per_logger(self):
+        logger = StructuredLogger("test_structured")
+        records = []
+
+        class CaptureHandler(logging.Handler):
+            def emit(self, record):
+                records.append(record)
+
+        logger.addHandler(CaptureHandler())
+        logger.warning("first")
+        logger.warning("second")
+
+        self.assertEqual(records[0].correlation_id, records[1].correlation_id)
+        self.assertEqual(records[0].correlation_id, logger.correlation_id)
+
     def test_log_rotation(self):
         logger = setup_logging(
             log_dir=self.test_log_dir,
@@ -75,4 +101,29 @@ class TestLoggingConfig(unittest.TestCase):
         
         log_files = os.listdir(self.test_log_dir)
         self.assertGreaterEqual(len(log_files), 2)  # Should have at least 2 files due to rotation
-        
\ No newline at end of file
+        
+
+    def test_queue_logging(self):
+        logger = setup_logging(log_dir=self.test_log_dir, use_queue=True)
+        self.assertEqual(len(logger.handlers), 1)
+        self.assertIsInstance(logger.handlers[0], QueueHandler)
+
+        logger.info("queued message")
+        try:
+            raise ValueError("queued failure")
+        except ValueError:
+            logger.exception("queued exception")
+        listener = logger.queue_listener
+        listener.stop()
+        listener.stop()  # Already stopped: a no-op, as at interpreter exit
+        for handler in listener.handlers:
+            handler.close()
+
+        contents = ''
+        for file in os.listdir(self.test_log_dir):
+            with open(os.path.join(self.test_log_dir, file)) as f:
+                contents += f.read()
+        self.assertIn("queued message", contents)
+        records = [json.loads(line) for line in contents.splitlines()]
+        failure = next(r for r in records if r['message'] == "queued exception")
+        self.assertIn("ValueError: queued failure", failure['exception'])
@@ -1,10 +1,61 @@
 import unittest
+from unittest.mock import Mock, patch
+from types import SimpleNamespace
+import numpy as np
+import pytest
+torch = pytest.importorskip("torch")
+from src.ai_engine import pattern_recognizer
 from src.ai_engine.pattern_recognizer import PatternRecognizer
+from src.ai_engine.knowledge_base import KnowledgeBase
+from src.ai_engine.exceptions import PatternAnalysisError
 import ast
 
+
+class _FakeTensor:
+    """Minimal stand-in for the slicing/.numpy() calls made on model outputs."""
+    def __init__(self, array):
+        self.array = array
+
+    def __getitem__(self, index):
+        return _FakeTensor(self.array[index])
+
+    def float(self):
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
 class TestPatternRecognizer(unittest.TestCase):
     def setUp(self):
-        self.recognizer = PatternRecognizer()
+        # Pinned to the CPU so a CUDA host does not move the fake inputs
+        self.recognizer = PatternRecognizer(device='cpu')
+
+    def _use_fake_model(self, fail_above=None):
+        """Swaps in a tokenizer/model pair whose [CLS] row is len(code).
+
+        Returns the list that records each batch passed to the tokenizer.
+        Batches larger than fail_above raise a CUDA out-of-memory error.
+        """
+        batches = []
+
+        def tokenizer(codes, **kwargs):
+            batches.append(list(codes))
+            return {'codes': codes}
+
+        def model(codes):
+            if fail_above is not None and len(codes) > fail_above:
+                raise torch.cuda.OutOfMemoryError("CUDA out of memory")
+            # Hidden state of shape (batch, tokens, dim)
+            hidden = np.array([[[len(code)] * 4] for code in codes], dtype=float)
+            return SimpleNamespace(last_hidden_state=_FakeTensor(hidden))
+
+        self.recognizer.tokenizer = tokenizer
+        self.recognizer.embedding_model = model
+        return batches
 
     def test_analyze_class_patterns(self):
         code = '''
@@ -37,3 +88,175 @@ def my_function():
         
         self.assertTrue(any(p['type'] == 'decorator' for p in patterns))
         self.assertTrue(any(p['type'] == 'function_definition' for p in patterns))
+
+    def test_get_embeddings_batches_blocks_in_input_order(self):
+        """Test that blocks are encoded in batches and returned in input order"""
+        batches = self._use_fake_model()
+        code_blocks = ['x' * n for n in (5, 1, 3, 2, 4)]
+
+        with patch.object(pattern_recognizer, '_EMBEDDING_BATCH_SIZE', 2):
+            embeddings = self.recognizer._get_embeddings(code_blocks)
+
+        # Shortest blocks are batched together to minimise padding
+        self.assertEqual(batches, [['x', 'xx'], ['xxx', 'xxxx'], ['xxxxx']])
+        self.assertEqual(embeddings.shape, (5, 4))
+        self.assertEqual(embeddings.dtype, np.float32)
+        self.assertEqual(list(embeddings[:, 0]), [5, 1, 3, 2, 4])
+
+    def test_get_embeddings_only_encodes_uncached_blocks(self):
+        """Test that repeated and previously seen blocks skip the model"""
+        batches = self._use_fake_model()
+
+        self.recognizer._get_embeddings(['x', 'xx', 'x'])
+        embeddings = self.recognizer._get_embeddings(['xx', 'xxx'])
+
+        self.assertEqual(batches, [['x', 'xx'], ['xxx']])
+        self.assertEqual(list(embeddings[:, 0]), [2, 3])
+
+    def test_get_embeddings_evicts_least_recently_used(self):
+        """Test that the cache is capped and keeps recently used blocks"""
+        batches = self._use_fake_model()
+
+        with patch.object(pattern_recognizer, '_EMBEDDING_CACHE_SIZE', 2):
+            self.recognizer._get_embeddings(['x', 'xx'])
+            self.recognizer._get_embeddings(['x'])
+            self.recognizer._get_embeddings(['xxx'])
+            embeddings = self.recognizer._get_embeddings(['x', 'xx'])
+            # More distinct blocks than the cache holds still come back whole
+            wide = self.recognizer._get_embeddings(['a', 'bb', 'ccc'])
+
+        self.assertEqual(batches, [['x', 'xx'], ['xxx'], ['xx'], ['a', 'bb', 'ccc']])
+        self.assertEqual(list(embeddings[:, 0]), [1, 2])
+        self.assertEqual(list(wide[:, 0]), [1, 2, 3])
+        self.assertEqual(len(self.recognizer._embedding_cache), 2)
+
+    def test_get_embeddings_uses_embedding_store(self):
+        """Test that stored embeddings skip the model and new ones are stored"""
+        batches = self._use_fake_model()
+        stored_key = pattern_recognizer.hashlib.blake2b(b'xx', digest_size=16).digest()
+        store = Mock()
+        store.get_embeddings.return_value = {stored_key: np.full(4, 7.0)}
+        self.recognizer.embedding_store = store
+
+        embeddings = self.recognizer._get_embeddings(['x', 'xx'])
+
+        self.assertEqual(batches, [['x']])
+        self.assertEqual(list(embeddings[:, 0]), [1, 7])
+        fingerprint = self.recognizer._model_fingerprint
+        self.assertEqual(store.get_embeddings.call_args[0][0], fingerprint)
+        stored_model, new_embeddings = store.store_embeddings.call_args[0]
+        self.assertEqual(stored_model, fingerprint)
+        self.assertEqual(len(new_embeddings), 1)
+        self.assertNotIn(stored_key, new_embeddings)
+
+    def test_embedding_store_is_partitioned_by_model_configuration(self):
+        """Test that configurations sharing a store never read each other's vectors"""
+        batches = self._use_fake_model()
+        store = KnowledgeBase(':memory:')
+        self.addCleanup(store.conn.close)
+        self.recognizer.embedding_store = store
+        bf16 = PatternRecognizer(half_precision=True, device='cpu', embedding_store=store)
+        bf16.tokenizer = self.recognizer.tokenizer
+        bf16.embedding_model = self.recognizer.embedding_model
+        fp32 = PatternRecognizer(device='cpu', embedding_store=store)
+
+        self.recognizer._get_embeddings(['x'])
+        bf16._get_embeddings(['x'])
+        self.assertNotEqual(bf16._model_fingerprint, self.recognizer._model_fingerprint)
+        self.assertEqual(batches, [['x'], ['x']])
+
+        # Same configuration as the first recognizer, so its vector is reused
+        embeddings = fp32._get_embeddings(['x'])
+        self.assertEqual(batches, [['x'], ['x']])
+        self.assertEqual(list(embeddings[:, 0]), [1])
+
+    def test_get_embeddings_splits_batch_on_out_of_memory(self):
+        """Test that a batch which runs out of GPU memory is retried in halves"""
+        batches = self._use_fake_model(fail_above=2)
+        code_blocks = ['x' * n for n in (4, 1, 3, 2)]
+
+        embeddings = self.recognizer._get_embeddings(code_blocks)
+
+        self.assertEqual(batches[1:], [['x', 'xx'], ['xxx', 'xxxx']])
+        self.assertEqual(list(embeddings[:, 0]), [4, 1, 3, 2])
+
+    def test_cluster_patterns(self):
+        embeddings = np.array([[0.0, 0.0], [0.1, 0.0], [5.0, 5.0], [5.0, 5.1], [9.0, 0.0]])
+        clusters = self.recognizer._cluster_patterns(embeddings)
+
+        self.assertEqual(clusters[0], clusters[1])
+        self.assertEqual(clusters[2], clusters[3])
+        self.assertNotEqual(clusters[0], clusters[2])
+        self.assertEqual(clusters[4], -1)
+
+    def test_half_precision_casts_model_to_bfloat16(self):
+        """Test that half_precision puts the model in eval mode as bfloat16"""
+        model = Mock()
+        recognizer = PatternRecognizer(model=model, half_precision=True, device='cpu')
+
+        self.assertIs(recognizer.embedding_model, model)
+        model.eval.assert_called_once()
+        model.to.assert_called_once_with(dtype=torch.bfloat16)
+
+    def test_quantize_swaps_in_int8_model(self):
+        """Test that quantize replaces the Linear layers with dynamic int8 ones"""
+        model = Mock()
+        with patch.object(torch.ao.quantization, 'quantize_dynamic') as quantize_dynamic:
+            recognizer = PatternRecognizer(model=model, quantize=True, device='cpu')
+
+        quantize_dynamic.assert_called_once_with(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+        self.assertIs(recognizer.embedding_model, quantize_dynamic.return_value)
+
+    def test_cuda_device_moves_model_and_inputs(self):
+        """Test that a GPU device receives the model and each tokenized batch"""
+        model = Mock()
+        recognizer = PatternRecognizer(model=model, device='cuda')
+        model.to.assert_called_once_with('cuda')
+
+        input_ids = Mock()
+        recognizer.tokenizer = Mock(return_value={'input_ids': input_ids})
+        recognizer.embedding_model = lambda **inputs: SimpleNamespace(
+            last_hidden_state=_FakeTensor(np.zeros((1, 1, 4)))
+        )
+        recognizer._get_embeddings(['x = 1'])
+
+        input_ids.to.assert_called_once_with('cuda')
+
+    def test_autocast_only_enabled_for_cuda_devices(self):
+        """Test that fp16 autocast follows the device type, not the device string"""
+        def device(name):
+            return SimpleNamespace(type=name.split(':')[0])
+
+        with patch.object(torch, 'device', side_effect=device):
+            self.assertTrue(PatternRecognizer(model=Mock(), device='cuda:1')._autocast)
+            self.assertFalse(PatternRecognizer(model=Mock(), device='mps')._autocast)
+            self.assertFalse(
+                PatternRecognizer(model=Mock(), device='cuda', half_precision=True)._autocast
+            )
+
+    def test_quantize_rejects_gpu_device(self):
+        with self.assertRaises(PatternAnalysisError):
+            PatternRecognizer(model=Mock(), quantize=True, device='cuda')
+
+    def test_compile_model_warms_up_compiled_model(self):
+        """Test that compile_model swaps in the compiled model after a warm-up pass"""
+        tokenizer = Mock(return_value={'input_ids': Mock()})
+        with patch('transformers.AutoTokenizer.from_pretrained', return_value=tokenizer), \
+             patch.object(torch, 'compile') as compile_:
+            recognizer = PatternRecognizer(model=Mock(), compile_model=True, device='cpu')
+
+        self.assertIs(recognizer.embedding_model, compile_.return_value)
+        compile_.return_value.assert_called_once()
+
+    def test_compile_model_falls_back_to_eager(self):
+        """Test that a failing compile keeps the eager model"""
+        model = Mock()
+        tokenizer = Mock(return_value={'input_ids': Mock()})
+        with patch('transformers.AutoTokenizer.from_pretrained', return_value=tokenizer), \
+             patch.object(torch, 'compile') as compile_:
+            compile_.return_value.side_effect = RuntimeError("backend failed")
+            recognizer = PatternRecognizer(model=model, compile_model=True, device='cpu')
+
+        self.assertIs(recognizer.embedding_model, model)